@@ -0,0 +1,40 @@
+"""Добавление индекса активных сессий пользователя
+
+Revision ID: 5b2e7c9a41d3
+Revises: 85824b43cfc3
+Create Date: 2026-10-17 10:12:34.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e7c9a41d3'
+down_revision: Union[str, None] = '85824b43cfc3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_sessions_user_id_active_last_activity',
+            'sessions',
+            ['user_id', sa.text('last_activity DESC')],
+            unique=False,
+            postgresql_where=sa.text('is_active IS true'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_sessions_user_id_active_last_activity',
+            table_name='sessions',
+            postgresql_concurrently=True,
+        )
@@ -46,8 +46,7 @@ class AuthenticationService(BaseService, AuthenticationServiceInterface):
         """
         try:
             await password_manager.reset_failed_attempts(user)
-            user.last_login = datetime.utcnow()
-            await self.user_repository.update_user(user)
+            await self.user_repository.update_user(user, {"last_login": datetime.utcnow()})
         
         except Exception as err:
             self.log_error(f"Ошибка при обновлении информации о входе пользователя {str(user.id)}: {err}")
@@ -81,7 +80,7 @@ class AuthenticationService(BaseService, AuthenticationServiceInterface):
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Аккаунт не подтвержден, обратитесь к администратору")
             
             # Проверка пароля
-            if not password_manager.verify_password(credentials.password, user.hashed_password):
+            if not password_manager.verify_password_cached(str(user.id), credentials.password, user.hashed_password):
                 await password_manager.handle_failed_login(user)
                 await self.commit_transaction()
                 raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверное имя пользователя/почта или пароль")
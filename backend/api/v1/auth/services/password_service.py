@@ -94,7 +94,7 @@ class PasswordService(BaseService, PasswordServiceInterface):
             return False, lockout_status
         
         # Проверяем пароль через core
-        password_valid = self.password_manager.verify_password(password, security_info['password_hash'])
+        password_valid = self.password_manager.verify_password_cached(user_id, password, security_info['password_hash'])
         
         if password_valid:
             # Пароль верный - сбрасываем попытки в БД
@@ -107,20 +107,17 @@ class PasswordService(BaseService, PasswordServiceInterface):
             )
             logger.info(f"Успешная аутентификация пользователя {user_id}")
         else:
-            # Пароль неверный - увеличиваем счетчик в БД
-            new_attempts = await self.password_repository.increment_failed_attempts(user_id)
-            
-            # Проверяем, нужно ли блокировать
-            if self.password_manager.should_lock_user(new_attempts):
-                lockout_time = self.password_manager.calculate_lockout_end_time()
-                await self.password_repository.set_lockout_time(user_id, lockout_time)
-            
-            # Получаем обновленный статус
-            updated_security = await self.password_repository.get_security_info(user_id)
-            final_status = self.password_manager.calculate_lockout_status(
-                updated_security['failed_attempts'],
-                updated_security['locked_until']
+            # Пароль неверный - увеличиваем счетчик и при необходимости блокируем одним запросом в БД
+            failed_attempt = await self.password_repository.register_failed_attempt(
+                user_id,
+                self.password_manager.max_failed_attempts,
+                self.password_manager.calculate_lockout_end_time()
             )
+            if not failed_attempt:
+                raise ValueError("Пользователь не найден")
+
+            failed_attempts, locked_until = failed_attempt
+            final_status = self.password_manager.calculate_lockout_status(failed_attempts, locked_until)
             
             logger.warning(f"Неудачная попытка входа для пользователя {user_id}, осталось попыток: {final_status.attempts_remaining}")
         
@@ -148,6 +145,7 @@ class PasswordService(BaseService, PasswordServiceInterface):
         
         # Обновляем в БД
         success = await self.password_repository.update_password_hash(user_id, new_password_hash)
+        self.password_manager.invalidate_verify_cache(user_id)
         
         if success:
             self.log_info(f"Пароль пользователя {user_id} успешно изменен")
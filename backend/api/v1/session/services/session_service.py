@@ -13,7 +13,7 @@ from backend.core.interfaces.session.session_services import SessionServiceInter
 from core.services.base_service import BaseService
 from repositories.session_repository import SessionRepository
 from core.models.user import User
-from core.models.session import Session
+from core.models.session import Session, SessionView
 from core.extensions.logger import logger
 from core.config.config import settings
 from api.v1.session.schemas import SessionFilter, SessionsPage, SessionResponse, UserAgentInfo
@@ -68,15 +68,25 @@ class SessionService(BaseService, SessionServiceInterface):
             logger.error(f"Ошибка при получении сессий пользователя {user_id}: {err}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Ошибка при получении сессий пользователя")
 
-    @cache(expire=3600, coder=CustomJsonCoder, namespace="sessions:active")
-    async def get_active_sessions_user(self, user_id: str) -> List[Session]:
+    async def get_active_sessions_user(self, user_id: str) -> List[SessionView]:
         """
         Получает активные сессии пользователя с кэшированием\n
         `user_id` - ID пользователя\n
-        Возвращает список активных сессий, иначе возвращает пустой список
+        Возвращает список активных сессий только для чтения, иначе возвращает пустой список
+        """
+        sessions = await self._get_active_sessions_user_cached(user_id)
+        # При попадании в кэш fastapi-cache возвращает словари, загруженные из JSON
+        return [session if isinstance(session, SessionView) else SessionView.from_dict(session) for session in sessions]
+
+    @cache(expire=3600, coder=CustomJsonCoder, namespace="sessions:active")
+    async def _get_active_sessions_user_cached(self, user_id: str) -> List[SessionView]:
+        """
+        Кэшируемая выборка активных сессий пользователя для `get_active_sessions_user`\n
+        `user_id` - ID пользователя\n
+        Возвращает список SessionView при промахе кэша или список словарей с теми же полями при попадании
         """
         try:
-            return await self.session_repository.get_active_sessions_by_user(user_id)
+            return await self.session_repository.list_active_sessions_view(user_id)
         except Exception as err:
             logger.error(f"Ошибка при получении активных сессий пользователя {user_id}: {err}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Ошибка при получении активных сессий пользователя")
@@ -268,9 +278,9 @@ class SessionService(BaseService, SessionServiceInterface):
             if str(session.user_id) != user_id:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет прав для завершения других сессий")
             
-            await self.session_repository.terminate_other_sessions(user_id, current_session_id)
+            terminated_count = await self.session_repository.rotate_to_single_session(user_id, current_session_id)
             await FastAPICache.clear(f"sessions")
-            logger.info(f"[terminate_other_sessions] Все сессии пользователя {user_id}, кроме текущей, завершены")
+            logger.info(f"[terminate_other_sessions] Завершено {terminated_count} сессий пользователя {user_id}, кроме текущей")
 
         except Exception as err:
             await self.db.rollback()
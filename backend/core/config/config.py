@@ -19,6 +19,8 @@ class BaseSettingsClass(BaseSettings):
     EMPLOYEE_ROLES: List[str] = Field(["superadmin", "admin", "leader", "employee"], env="EMPLOYEE_ROLES", description="Роли сотрудников")
     AUTHENTICATED_ROLES: List[str] = Field(["superadmin", "admin", "leader", "employee", "guest"], env="AUTHENTICATED_ROLES", description="Роли аутентифицированных пользователей")
     MAX_ACTIVE_SESSIONS_PER_USER: int = Field(5, env="MAX_ACTIVE_SESSIONS_PER_USER", description="Максимальное количество активных сессий для пользователя")
+    SESSION_ACTIVITY_FLUSH_INTERVAL: float = Field(1.0, env="SESSION_ACTIVITY_FLUSH_INTERVAL", description="Интервал записи активности сессий в БД в секундах")
+    SERVER_SIDE_DATE_FORMAT: bool = Field(True, env="SERVER_SIDE_DATE_FORMAT", description="Форматирование дат в 'DD.MM.YYYY' на сервере (иначе даты отдаются в ISO и форматируются клиентом)")
     DEVELOPER_TG: str = Field("https://t.me/XopXeyLalalei", env="DEVELOPER_TG", description="Телеграм разработчика")
     
     # Настройки push-уведомлений
@@ -52,10 +54,24 @@ class BaseSettingsClass(BaseSettings):
     DATABASE_URL: str = Field(..., env="DATABASE_URL", description="URL базы данных")
     SQLALCHEMY_ECHO: bool = False
     SQLALCHEMY_ENGINE_OPTIONS: dict = {
-        "pool_size": 30,
-        "pool_recycle": 3600,
+        "pool_size": 5, # На каждый воркер, итого до WORKERS_COUNT * (pool_size + max_overflow) соединений
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
         "pool_pre_ping": True,
+        "query_cache_size": 1200, # Размер кэша скомпилированных SQL выражений SQLAlchemy
     }
+    # Параметры подключения asyncpg, передаются в connect_args, а не в create_async_engine
+    DATABASE_CONNECT_ARGS: dict = {
+        "prepared_statement_cache_size": 200,
+        "statement_timeout": 5000, # Миллисекунды
+    }
+    # При подключении через PgBouncer параметры сервера не передаются при подключении (PgBouncer отклоняет их как
+    # unsupported startup parameter), их нужно задать в БД для роли приложения:
+    #   ALTER ROLE <роль> SET statement_timeout = '5000'; ALTER ROLE <роль> SET jit = off;
+    DATABASE_MAX_CONNECTIONS: int = Field(100, env="DATABASE_MAX_CONNECTIONS", description="Максимальное количество соединений с БД, доступное приложению (max_connections PostgreSQL)")
+    DATABASE_PGBOUNCER: bool = Field(False, env="DATABASE_PGBOUNCER", description="Подключение к БД через PgBouncer в режиме transaction pooling")
+    RUN_DDL_ON_STARTUP: bool = Field(True, env="RUN_DDL_ON_STARTUP", description="Создание таблиц БД при запуске приложения")
 
     # Настройки Redis
     REDIS_SSL: bool = Field(False, env="REDIS_SSL", description="Использование SSL для Redis")
@@ -84,6 +100,8 @@ class BaseSettingsClass(BaseSettings):
     MIN_LENGTH: int = Field(8, env="MIN_LENGTH", description="Минимальная длина пароля")
     MAX_FAILED_ATTEMPTS: int = Field(5, env="MAX_FAILED_ATTEMPTS", description="Максимальное количество неудачных попыток входа")
     LOCKOUT_DURATION: int = Field(15, env="LOCKOUT_DURATION", description="Время блокировки в секундах")
+    PASSWORD_VERIFY_CACHE_TTL: int = Field(60, env="PASSWORD_VERIFY_CACHE_TTL", description="Время хранения успешных проверок пароля в памяти в секундах (0 - отключено)")
+    PASSWORD_VERIFY_CACHE_SIZE: int = Field(4096, env="PASSWORD_VERIFY_CACHE_SIZE", description="Максимальное количество успешных проверок пароля в памяти")
     SESSION_COOKIE_SECURE: bool = Field(True, env="SESSION_COOKIE_SECURE", description="Использование cookie с флагом secure")
 
     # Настройки ограничителя запросов
@@ -154,6 +172,7 @@ class ProductionSettings(BaseSettingsClass):
     """
     DEBUG: bool = False
     REMEMBER_COOKIE_SECURE: bool = True
+    RUN_DDL_ON_STARTUP: bool = False # Схема БД обновляется миграциями Alembic
     CORS_ORIGINS: List[str] = [
         "https://hr.exp-cr.ru", "https://preza.exp-cr.ru", "https://ecgamingstudio.com",
     ]
@@ -176,6 +195,14 @@ class ProductionSettings(BaseSettingsClass):
             raise ValueError(f"Обязательная переменная окружения отсутствует: {info.field_name}")
         return error
 
+class TestingSettings(DevelopmentSettings):
+    """
+    Конфигурация для тестов\n
+    Минимальная стоимость bcrypt, чтобы хеширование паролей не занимало время тестов
+    """
+    BCRYPT_ROUNDS: int = 4
+    SQLALCHEMY_ECHO: bool = False
+
 def get_settings() -> BaseSettingsClass:
     """
     Получение конфигурации в зависимости от окружения\n
@@ -185,6 +212,7 @@ def get_settings() -> BaseSettingsClass:
     settings_map = {
         "development": DevelopmentSettings,
         "production": ProductionSettings,
+        "test": TestingSettings,
     }
 
     return settings_map.get(env, DevelopmentSettings)()
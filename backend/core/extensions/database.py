@@ -1,21 +1,68 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import NullPool
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
+import uuid
 
 from core.config.config import settings
 
+def _build_connect_args() -> dict:
+    """
+    Параметры подключения asyncpg\n
+    При `DATABASE_PGBOUNCER` подготовленные выражения не кэшируются и получают уникальные имена,
+    так как PgBouncer в режиме transaction pooling не сохраняет их между транзакциями.
+    Параметры сервера (`server_settings`) PgBouncer не принимает при подключении, поэтому в этом режиме
+    они не передаются и задаются на стороне БД через `ALTER ROLE ... SET` / `ALTER DATABASE ... SET`
+    """
+    options = settings.DATABASE_CONNECT_ARGS
+    connect_args = {
+        # Кэш подготовленных выражений asyncpg на каждое соединение
+        "prepared_statement_cache_size": options.get("prepared_statement_cache_size", 200),
+        "server_settings": {
+            # Ограничение времени выполнения запроса, чтобы медленный запрос не занимал соединение пула
+            "statement_timeout": str(options.get("statement_timeout", 5000)),
+            # JIT не окупается на коротких OLTP запросах и замедляет интроспекцию типов asyncpg
+            "jit": "off",
+        },
+    }
+
+    if settings.DATABASE_PGBOUNCER:
+        connect_args.pop("server_settings")
+        connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        })
+
+    return connect_args
+
+def _build_pool_options() -> dict:
+    """
+    Параметры пула соединений SQLAlchemy\n
+    При `DATABASE_PGBOUNCER` пулом управляет PgBouncer, поэтому используется NullPool:
+    соединения не удерживаются на стороне приложения, и именованные подготовленные выражения
+    не накапливаются на серверных соединениях PgBouncer
+    """
+    if settings.DATABASE_PGBOUNCER:
+        return {"poolclass": NullPool}
+
+    options = settings.SQLALCHEMY_ENGINE_OPTIONS
+    return {
+        "pool_size": options.get("pool_size", 5),
+        "max_overflow": options.get("max_overflow", 10),
+        "pool_timeout": options.get("pool_timeout", 30),
+        "pool_recycle": options.get("pool_recycle", 1800),
+        "pool_pre_ping": options.get("pool_pre_ping", True),
+    }
+
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.SQLALCHEMY_ECHO,
     future=True,
-    poolclass=QueuePool,
-    pool_size=settings.SQLALCHEMY_ENGINE_OPTIONS.get("pool_size", 30),
-    max_overflow=settings.SQLALCHEMY_ENGINE_OPTIONS.get("max_overflow", 100),
-    pool_timeout=settings.SQLALCHEMY_ENGINE_OPTIONS.get("pool_timeout", 30),
-    pool_recycle=settings.SQLALCHEMY_ENGINE_OPTIONS.get("pool_recycle", 1800),
-    pool_pre_ping=settings.SQLALCHEMY_ENGINE_OPTIONS.get("pool_pre_ping", True),
+    **_build_pool_options(),
+    query_cache_size=settings.SQLALCHEMY_ENGINE_OPTIONS.get("query_cache_size", 1200),
+    connect_args=_build_connect_args(),
 )
 
 AsyncSessionFactory = sessionmaker(
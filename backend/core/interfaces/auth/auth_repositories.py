@@ -18,4 +18,4 @@ class UserRepositoryInterface(Protocol):
     async def get_by_id(self, user_id: str) -> Optional[User]: ...
     async def get_by_login_or_email(self, login_or_email: str) -> Optional[User]: ...
     async def create_user(self, user_data: UserCreate) -> User: ...
-    async def update_user(self, user: User) -> User: ...
+    async def update_user(self, user: User, changes: Optional[dict] = None) -> User: ...
@@ -1,26 +1,34 @@
 # backend/core/interfaces/session/session_repositories.py - Интерфейс для репозитория сессий
 
 from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.models.session import Session
+from core.models.session import Session, SessionView
 
 class SessionRepositoryInterface:
     """
     Интерфейс для репозитория сессий
 
     Методы:
-        - `update_session_last_activity` - Обновляет время последней активности сессии
+        - `update_session_last_activity` - Откладывает обновление времени последней активности сессии
+        - `flush_session_last_activity` - Записывает отложенные обновления активности сессий одним запросом
         - `get_session_by_id` - Получает сессию по ID
         - `get_sessions_by_user` - Получает все сессии пользователя
         - `get_active_sessions_by_user` - Получает активные сессии пользователя
+        - `list_active_sessions_view` - Получает активные сессии пользователя только для чтения
         - `deactivate_session` - Деактивирует сессию
         - `terminate_other_sessions` - Завершает все сессии пользователя, кроме текущей
         - `deactivate_all_sessions` - Деактивирует все сессии пользователя
+        - `rotate_to_single_session` - Оставляет активной только текущую сессию пользователя и обновляет её активность
     """
     async def update_session_last_activity(self, session_id: str) -> None: ...
+    @classmethod
+    async def flush_session_last_activity(cls, session: AsyncSession) -> int: ...
     async def get_session_by_id(self, session_id: str) -> Session: ...
     async def get_sessions_by_user(self, user_id: str) -> List[Session]: ...
     async def get_active_sessions_by_user(self, user_id: str) -> List[Session]: ...
+    async def list_active_sessions_view(self, user_id: str) -> List[SessionView]: ...
     async def deactivate_session(self, session_id: str) -> bool: ...
     async def terminate_other_sessions(self, user_id: str, current_session_id: str) -> int: ...
     async def deactivate_all_sessions(self, user_id: str) -> int: ...
+    async def rotate_to_single_session(self, user_id: str, current_session_id: str) -> int: ...
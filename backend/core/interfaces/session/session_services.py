@@ -2,7 +2,7 @@
 
 from typing import Protocol, List, Dict
 
-from core.models.session import Session
+from core.models.session import Session, SessionView
 from core.models.user import User
 
 class SessionServiceInterface(Protocol):
@@ -20,7 +20,7 @@ class SessionServiceInterface(Protocol):
     """
     async def get_session_by_id(self, session_id: str) -> Session: ...
     async def get_sessions_user(self, user_id: str) -> List[Session]: ...
-    async def get_active_sessions_user(self, user_id: str) -> List[Session]: ...
+    async def get_active_sessions_user(self, user_id: str) -> List[SessionView]: ...
     async def create_user_session(self, user: User, device_info: Dict[str, str]) -> Session: ...
     async def update_session_activity(self, session_id: str) -> None: ...
     async def terminate_other_sessions(self, current_session_id: str, user_id: str) -> int: ...
@@ -1,5 +1,4 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from prometheus_client import Counter, Histogram, Gauge, start_http_server, REGISTRY
 import time
 from core.config.config import settings
@@ -26,7 +25,7 @@ IN_PROGRESS_REQUESTS = Gauge(
     ["method", "path"]
 )
 
-class PrometheusMiddleware(BaseHTTPMiddleware):
+class PrometheusMiddleware:
     """
     Middleware для сбора метрик Prometheus
     Метрики для сбора:
@@ -34,35 +33,43 @@ class PrometheusMiddleware(BaseHTTPMiddleware):
     - время выполнения запросов
     - количество активных запросов
     """
-    def __init__(self, app, app_name="fastapi_app"):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, app_name="fastapi_app"):
+        self.app = app
         self.app_name = app_name
 
         self._register_metric_if_not_exists(REQUEST_COUNT)
         self._register_metric_if_not_exists(REQUEST_LATENCY)
         self._register_metric_if_not_exists(IN_PROGRESS_REQUESTS)
 
-    async def dispatch(self, request: Request, call_next):
-        method = request.method
-        path = request.url.path
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        path = scope["path"]
 
         # Счетчик активных запросов
         IN_PROGRESS_REQUESTS.labels(method=method, path=path).inc()
 
         # Время выполнения запроса
-        start_time = time.time()
+        start_time = time.perf_counter()
         status_code = 500 # По умолчанию - ошибка сервера
 
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         try:
-            response = await call_next(request)
-            status_code = response.status_code
-            return response
+            await self.app(scope, receive, send_wrapper)
         except Exception as err:
             # Логируем исключение, которое не было перехвачено обработчиками FastAPI
             logger.error(f"Unhandled exception in PrometheusMiddleware: {err}", exc_info=True)
             raise err # Передаем исключение дальше для обработки FastAPI
         finally:
-            latency = time.time() - start_time
+            latency = time.perf_counter() - start_time
             # Счетчик активных запросов
             IN_PROGRESS_REQUESTS.labels(method=method, path=path).dec()
             # Гистограмма времени выполнения запроса
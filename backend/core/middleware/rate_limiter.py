@@ -1,51 +1,74 @@
-from fastapi import Request, HTTPException, status, FastAPI
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from redis.asyncio import RedisError
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from core.extensions.redis import redis_client
 from core.config.config import settings
 from core.extensions.logger import logger
+from core.middleware.security import SECURITY_HEADERS
 
 # Middleware для ограничения количества запросов на API
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """
     Middleware для ограничения количества запросов на API
     """
-    def __init__(self, app: FastAPI):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
         self.time_rate_limiter = settings.TIME_RATE_LIMITER
         self.size_rate_limiter = settings.SIZE_RATE_LIMITER
 
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         try:
-            redis = await redis_client.get_client_with_retry()
-            if not redis:
-                logger.error("Не удалось получить подключение к Redis для ограничения количества запросов")
-                return await call_next(request)
-
-            client_ip = request.client.host if request.client else "unknown"
-            key = f"rate_limit:{client_ip}:{request.method}:{request.url.path}"
-            
-            try:
-                current = await redis.incr(key)
-                if current == 1:
-                    await redis.expire(key, self.time_rate_limiter)
-
-                if current > self.size_rate_limiter:
-                    ttl = await redis.ttl(key)
-                    detail_msg = f"Превышен лимит запросов. Попробуйте снова через {ttl} секунд" if ttl > 0 else "Превышен лимит запросов"
-                    raise HTTPException(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail=detail_msg,
-                        headers={"Retry-After": str(ttl)} if ttl > 0 else None
-                    )
-
-            except redis.RedisError as err:
-                logger.error(f"Ошибка при работе с Redis для ограничения количества запросов: {err}", exc_info=True)
-                pass
-
-            response = await call_next(request)
-            return response
-            
+            response = await self._check_rate_limit(scope)
         except Exception as err:
             logger.error(f"Неожиданная ошибка в ограничении количества запросов: {err}", exc_info=True)
-            return await call_next(request)
+            response = None
+
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def _check_rate_limit(self, scope: Scope) -> ORJSONResponse | None:
+        """
+        Проверяет лимит запросов для клиента\n
+        `scope` - ASGI scope запроса\n
+        Возвращает ответ 429, если лимит превышен, иначе None
+        """
+        redis = await redis_client.get_client_with_retry()
+        if not redis:
+            logger.error("Не удалось получить подключение к Redis для ограничения количества запросов")
+            return None
+
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        key = f"rate_limit:{client_ip}:{scope['method']}:{scope['path']}"
+
+        try:
+            current = await redis.incr(key)
+            if current == 1:
+                await redis.expire(key, self.time_rate_limiter)
+
+            if current > self.size_rate_limiter:
+                ttl = await redis.ttl(key)
+                detail_msg = f"Превышен лимит запросов. Попробуйте снова через {ttl} секунд" if ttl > 0 else "Превышен лимит запросов"
+                # Ответ отдается до SecurityMiddleware, поэтому заголовки безопасности добавляются здесь
+                headers = dict(SECURITY_HEADERS)
+                if ttl > 0:
+                    headers["Retry-After"] = str(ttl)
+                return ORJSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content={"message": detail_msg},
+                    headers=headers
+                )
+
+        except RedisError as err:
+            logger.error(f"Ошибка при работе с Redis для ограничения количества запросов: {err}", exc_info=True)
+
+        return None
@@ -1,8 +1,9 @@
-from sqlalchemy import String, DateTime, ForeignKey, Boolean
+from sqlalchemy import String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID
-from typing import Optional
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
 import uuid
 from models.base import Base
 
@@ -22,3 +23,55 @@ class Session(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False, doc="Активность сессии")
 
     user = relationship("User", back_populates="sessions")
+
+# Индекс для выборки активных сессий пользователя, отсортированных по последней активности
+Index(
+    "ix_sessions_user_id_active_last_activity",
+    Session.user_id,
+    Session.last_activity.desc(),
+    postgresql_where=Session.is_active.is_(True),
+)
+
+@dataclass(frozen=True, slots=True)
+class SessionView:
+    """
+    Представление сессии только для чтения, без загрузки ORM объекта
+    """
+    id: uuid.UUID
+    user_id: uuid.UUID
+    device: Optional[str]
+    browser: Optional[str]
+    os: Optional[str]
+    platform: Optional[str]
+    location: Optional[str]
+    ip_address: Optional[str]
+    last_activity: datetime
+    created_at: datetime
+    is_active: bool
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionView":
+        """
+        Восстанавливает представление из словаря, например загруженного из JSON кэша\n
+        `data` - Словарь с полями сессии, UUID и даты могут быть строками\n
+        Возвращает SessionView
+        """
+        def as_uuid(value: Any) -> uuid.UUID:
+            return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+        def as_datetime(value: Any) -> datetime:
+            return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+        return cls(
+            id=as_uuid(data["id"]),
+            user_id=as_uuid(data["user_id"]),
+            device=data.get("device"),
+            browser=data.get("browser"),
+            os=data.get("os"),
+            platform=data.get("platform"),
+            location=data.get("location"),
+            ip_address=data.get("ip_address"),
+            last_activity=as_datetime(data["last_activity"]),
+            created_at=as_datetime(data["created_at"]),
+            is_active=bool(data["is_active"]),
+        )
@@ -2,8 +2,11 @@
 
 from passlib.context import CryptContext
 from datetime import timedelta, datetime
+import hashlib
+import hmac
 import secrets
 import string
+import time
 from enum import Enum
 from typing import List, Optional
 from dataclasses import dataclass
@@ -47,6 +50,8 @@ class PasswordManager:
     Методы:
         - `hash_password` - Хеширование пароля с использованием bcrypt
         - `verify_password` - Проверка password на соответствие hashed_password
+        - `verify_password_cached` - Проверка пароля с кэшированием успешных проверок в памяти
+        - `invalidate_verify_cache` - Удаляет кэшированную проверку пароля пользователя
         - `validate_password` - Расширенная валидация пароля с оценкой сложности
         - `generate_random_password` - Генерация случайного пароля
         - `should_lock_user` - Определяет, нужно ли блокировать пользователя
@@ -64,6 +69,13 @@ class PasswordManager:
         self.max_failed_attempts = settings.MAX_FAILED_ATTEMPTS
         self.lockout_duration = timedelta(minutes=settings.LOCKOUT_DURATION)
 
+        # Кэш успешных проверок пароля: user_id -> (тег, время истечения)
+        # Хранится только keyed BLAKE2b тег от пароля и его хеша, ключ живет только в памяти процесса
+        self.verify_cache_ttl = settings.PASSWORD_VERIFY_CACHE_TTL
+        self.verify_cache_size = settings.PASSWORD_VERIFY_CACHE_SIZE
+        self._verify_cache: dict[str, tuple[bytes, float]] = {}
+        self._verify_cache_key = secrets.token_bytes(32)
+
         # Предопределенные наборы символов для генерации пароля
         self.uppercase_letters = string.ascii_uppercase
         self.lowercase_letters = string.ascii_lowercase
@@ -104,6 +116,47 @@ class PasswordManager:
             logger.error(f"[verify_password] Ошибка при проверке пароля: {err}")
             return False
 
+    def verify_password_cached(self, user_id: str, plain_password: str, hashed_password: str) -> bool:
+        """
+        Проверка пароля с кэшированием успешных проверок в памяти\n
+        Повторная проверка того же пароля в течение `PASSWORD_VERIFY_CACHE_TTL` секунд не выполняет bcrypt.
+        Кэшируются только успешные проверки; смена хеша пароля делает запись недействительной\n
+        `user_id` - ID пользователя\n
+        `plain_password` - Пароль в виде строки\n
+        `hashed_password` - Хешированный пароль\n
+        Возвращает True, если пароль верный, иначе False
+        """
+        if self.verify_cache_ttl <= 0 or not plain_password or not hashed_password:
+            return self.verify_password(plain_password, hashed_password)
+
+        tag = hashlib.blake2b(
+            hashed_password.encode() + b"\0" + plain_password.encode(),
+            digest_size=16,
+            key=self._verify_cache_key
+        ).digest()
+
+        now = time.monotonic()
+        cached = self._verify_cache.get(user_id)
+        if cached and cached[1] > now and hmac.compare_digest(cached[0], tag):
+            return True
+
+        if not self.verify_password(plain_password, hashed_password):
+            return False
+
+        self._verify_cache.pop(user_id, None)
+        if len(self._verify_cache) >= self.verify_cache_size:
+            # Удаляем самую старую запись
+            self._verify_cache.pop(next(iter(self._verify_cache)))
+        self._verify_cache[user_id] = (tag, now + self.verify_cache_ttl)
+        return True
+
+    def invalidate_verify_cache(self, user_id: str) -> None:
+        """
+        Удаляет кэшированную проверку пароля пользователя\n
+        `user_id` - ID пользователя
+        """
+        self._verify_cache.pop(user_id, None)
+
     def validate_password(self, password: str) -> PasswordValidationResult:
         """
         Расширенная валидация пароля с оценкой сложности\n
@@ -1,114 +1,126 @@
 from fastapi import FastAPI, Request, status, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
-from contextlib import asynccontextmanager
-from typing import Callable, List, Any
+from contextlib import asynccontextmanager, suppress
+from sqlalchemy import text
+from typing import Optional, Tuple
+import asyncio
 import time
-import pkg_resources
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from core.config.config import settings
 from models.base import Base
-from core.extensions.database import engine
+from core.extensions.database import engine, AsyncSessionFactory
 from core.extensions.redis import redis_client
-from core.websocket.websocket import websocket_manager
 from core.extensions.logger import logger
 from core.middleware.rate_limiter import RateLimitMiddleware
 from core.middleware.security import SecurityMiddleware
 from core.middleware.metrics import PrometheusMiddleware
+from repositories.session_repository import SessionRepository
+
+# Префикс, который Pydantic добавляет к сообщениям ValueError из валидаторов
+VALUE_ERROR_PREFIX = "Value error, "
+
+# Фоновая задача записи активности сессий в БД
+_session_activity_task: Optional[asyncio.Task] = None
+
+# Необходимые зависимости и их минимальные версии
+REQUIRED_DEPENDENCIES = {
+    "fastapi": (0, 109, 1),
+    "pydantic": (2, 11, 3),
+    "sqlalchemy": (2, 0, 25),
+    "redis": (4, 6, 0),
+    "uvicorn": (0, 27, 0),
+    "python-jose": (3, 3, 0),
+    "pyotp": (2, 8, 0),
+    "websockets": (15, 0, 1),
+}
 
-
-# Wrapper для асинхронных итераторов, обеспечивающий правильное закрытие
-class AsyncIteratorWrapper:
+# Middleware для измерения времени выполнения запросов
+class TimingMiddleware:
     """
-    Wrapper для асинхронных итераторов, обеспечивающий правильное закрытие
+    Middleware для измерения времени выполнения запросов\n
+    Реализован на уровне ASGI, без `BaseHTTPMiddleware`, чтобы не создавать
+    дополнительную задачу и пару потоков памяти на каждый запрос
     """
-    def __init__(self, obj: Any) -> None:
-        self._it = obj
-        self._close_callbacks: List[Callable] = []
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-    async def __aiter__(self) -> Any:
-        try:
-            async for item in self._it:
-                yield item
-        finally:
-            for callback in self._close_callbacks:
-                await callback()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    def add_callback(self, callback: Callable) -> None:
-        self._close_callbacks.append(callback)
+        start_time = time.perf_counter()
 
-# Middleware для измерения времени выполнения запросов
-class TimingMiddleware(BaseHTTPMiddleware):
-    """
-    Middleware для измерения времени выполнения запросов
-    """
-    async def dispatch(self, request: Request, call_next: Callable) -> Any:
-        start_time = time.time()
-        response = await call_next(request)
-        duration = time.time() - start_time
-        response.headers["X-Process-Time"] = str(duration)
-        return response
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                duration = time.perf_counter() - start_time
+                MutableHeaders(scope=message).append("X-Process-Time", f"{duration:.4f}")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 # Проверка совместимости версий библиотек
 async def check_dependencies() -> None:
     """
-    Проверка совместимости версий библиотек
+    Проверка совместимости версий библиотек\n
+    В production пропускается
     """
+    if settings.ENVIRONMENT == "production":
+        return
+
+    import pkg_resources
+
     logger.info("Проверка совместимости версий библиотек...")
-    
-    # Необходимые зависимости и их минимальные версии
-    required_dependencies = {
-        "fastapi": "0.109.1",
-        "pydantic": "2.11.3",
-        "sqlalchemy": "2.0.25",
-        "redis": "4.6.0",
-        "uvicorn": "0.27.0",
-        "python-jose": "3.3.0",
-        "pyotp": "2.8.0",
-        "websockets": "15.0.1"
-    }
-    
+
     try:
-        installed_packages = {pkg.key: pkg.version for pkg in pkg_resources.working_set}
-        
-        for package, min_version in required_dependencies.items():
+        installed_packages = {
+            pkg.key: pkg.version
+            for pkg in pkg_resources.working_set
+            if pkg.key in REQUIRED_DEPENDENCIES
+        }
+
+        for package, min_parts in REQUIRED_DEPENDENCIES.items():
             if package not in installed_packages:
                 logger.warning(f"Библиотека {package} не установлена")
                 continue
-                
+
             installed_version = installed_packages[package]
-            installed_parts = [int(part) for part in installed_version.split(".")[:3]]
-            min_parts = [int(part) for part in min_version.split(".")[:3]]
-            
-            if installed_parts < min_parts:
+            if _parse_version(installed_version) < min_parts:
                 logger.warning(
                     f"Установлена устаревшая версия {package}: {installed_version}. "
-                    f"Рекомендуется использовать не ниже {min_version}"
+                    f"Рекомендуется использовать не ниже {'.'.join(map(str, min_parts))}"
                 )
-                
+
         # Проверка совместимости Pydantic и FastAPI
         if "pydantic" in installed_packages and "fastapi" in installed_packages:
             pydantic_version = installed_packages["pydantic"]
             fastapi_version = installed_packages["fastapi"]
-            
-            pydantic_major = int(pydantic_version.split(".")[0])
-            fastapi_major = int(fastapi_version.split(".")[1])
-            
-            if pydantic_major >= 2 and fastapi_major < 109:
+
+            pydantic_major = _parse_version(pydantic_version)[0]
+            fastapi_minor = _parse_version(fastapi_version)[1]
+
+            if pydantic_major >= 2 and fastapi_minor < 109:
                 logger.warning(
                     f"Обнаружена возможная проблема совместимости: "
                     f"Pydantic v{pydantic_version} и FastAPI v{fastapi_version}. "
                     f"Рекомендуется использовать FastAPI >=0.109.1 с Pydantic v2.11.3"
                 )
-                
+
         logger.info("Проверка зависимостей завершена")
     except Exception as err:
         logger.error(f"Ошибка при проверке зависимостей: {err}")
 
+def _parse_version(version: str) -> Tuple[int, ...]:
+    """
+    Преобразует строку версии в кортеж из первых трех чисел\n
+    `version` - строка версии, например `0.109.1`
+    """
+    return tuple(int(part) for part in version.split(".")[:3])
+
 # Управление жизненным циклом приложения
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -140,11 +152,22 @@ async def lifespan(app: FastAPI):
 # Инициализация сервисов приложения
 async def initialize_services() -> None:
     """
-    Инициализация сервисов приложения
+    Инициализация сервисов приложения\n
+    Создание схемы БД не зависит от Redis, поэтому выполняется параллельно с подключением к Redis,
+    а кэш инициализируется только после Redis
     """
-    await _initialize_redis()
-    await _initialize_database()
-    await _initialize_cache()
+    database_task = asyncio.create_task(_initialize_database())
+    try:
+        await _initialize_redis()
+        await _initialize_cache()
+    except Exception:
+        database_task.cancel()
+        # Дожидаемся завершения задачи БД до закрытия движка; её ошибка вторична по отношению к ошибке Redis/кэша
+        with suppress(asyncio.CancelledError, Exception):
+            await database_task
+        raise
+    await database_task
+    _initialize_session_activity_flusher()
     # await _initialize_websocket()
 
 async def _initialize_redis() -> None:
@@ -158,11 +181,28 @@ async def _initialize_redis() -> None:
     
 async def _initialize_database() -> None:
     """
-    Инициализация базы данных
-    """
+    Инициализация базы данных\n
+    Таблицы создаются только при `RUN_DDL_ON_STARTUP`, иначе выполняется проверка соединения `SELECT 1`
+    """
+    # Каждый воркер держит собственный пул, поэтому суммарно до WORKERS_COUNT * (pool_size + max_overflow) соединений.
+    # Через PgBouncer пул на стороне приложения не используется, соединения ограничивает сам PgBouncer
+    if not settings.DATABASE_PGBOUNCER:
+        options = settings.SQLALCHEMY_ENGINE_OPTIONS
+        total_connections = settings.WORKERS_COUNT * (options.get("pool_size", 5) + options.get("max_overflow", 10))
+        if total_connections > settings.DATABASE_MAX_CONNECTIONS:
+            raise RuntimeError(
+                f"Пулы воркеров могут открыть до {total_connections} соединений с БД, "
+                f"что превышает DATABASE_MAX_CONNECTIONS={settings.DATABASE_MAX_CONNECTIONS}"
+            )
+    logger.info(f"Пул соединений с базой данных: {engine.pool.status()}")
+
     try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        if settings.RUN_DDL_ON_STARTUP:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        else:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
     except Exception as err:
         logger.error(f"Неожиданная ошибка при инициализации базы данных: {err}")
         raise
@@ -171,6 +211,9 @@ async def _initialize_cache() -> None:
     """
     Инициализация FastAPI Cache
     """
+    from fastapi_cache import FastAPICache
+    from fastapi_cache.backends.redis import RedisBackend
+
     try:
         redis = redis_client.get_client()
         FastAPICache.init(RedisBackend(redis), prefix="cache")
@@ -178,10 +221,31 @@ async def _initialize_cache() -> None:
         logger.error(f"Неожиданная ошибка при инициализации FastAPI Cache: {err}")
         raise
 
+def _initialize_session_activity_flusher() -> None:
+    """
+    Запуск фоновой задачи записи активности сессий в БД
+    """
+    global _session_activity_task
+    _session_activity_task = asyncio.create_task(_flush_session_activity_periodically())
+
+async def _flush_session_activity_periodically() -> None:
+    """
+    Периодически записывает отложенные обновления активности сессий в БД
+    """
+    while True:
+        await asyncio.sleep(settings.SESSION_ACTIVITY_FLUSH_INTERVAL)
+        try:
+            async with AsyncSessionFactory() as session:
+                await SessionRepository.flush_session_last_activity(session)
+        except Exception as err:
+            logger.error(f"Ошибка при записи активности сессий: {err}")
+
 async def _initialize_websocket() -> None:
     """
     Инициализация WebSocket менеджера
     """
+    from core.websocket.websocket import websocket_manager
+
     try:
         await websocket_manager.initialize()
         logger.info("WebSocket менеджер инициализирован")
@@ -198,6 +262,7 @@ async def cleanup_services() -> None:
     # await _cleanup_websocket()
     await _cleanup_cache()
     await _cleanup_redis()
+    await _cleanup_session_activity_flusher()
     await _cleanup_database()
 
 async def _cleanup_redis() -> None:
@@ -210,6 +275,23 @@ async def _cleanup_redis() -> None:
     except Exception as err:
         logger.error(f"Неожиданная ошибка при закрытии Redis: {err}")
     
+async def _cleanup_session_activity_flusher() -> None:
+    """
+    Остановка фоновой задачи и запись оставшихся обновлений активности сессий
+    """
+    global _session_activity_task
+    if _session_activity_task is not None:
+        _session_activity_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await _session_activity_task
+        _session_activity_task = None
+
+    try:
+        async with AsyncSessionFactory() as session:
+            await SessionRepository.flush_session_last_activity(session)
+    except Exception as err:
+        logger.error(f"Неожиданная ошибка при записи активности сессий: {err}")
+
 async def _cleanup_database() -> None:
     """
     Очистка соединения с базой данных
@@ -221,8 +303,15 @@ async def _cleanup_database() -> None:
 
 async def _cleanup_cache() -> None:
     """
-    Очистка FastAPI Cache
+    Очистка FastAPI Cache\n
+    Кэш очищается только в тестовом окружении: очистка сканирует все ключи с префиксом,
+    а прогретый кэш нужен следующим запущенным воркерам
     """
+    if settings.ENVIRONMENT != "test":
+        return
+
+    from fastapi_cache import FastAPICache
+
     try:
         backend = FastAPICache.get_backend()
         if backend is not None:
@@ -236,6 +325,8 @@ async def _cleanup_websocket() -> None:
     """
     Очистка WebSocket менеджера
     """
+    from core.websocket.websocket import websocket_manager
+
     try:
         if websocket_manager:
             await websocket_manager.stop_redis_listener()
@@ -246,7 +337,6 @@ async def _cleanup_websocket() -> None:
                     await websocket_manager.disconnect(connection_info.websocket, "server_shutdown")
                 except Exception as disconnect_err:
                     logger.warning(f"Ошибка при отключении {connection_id}: {disconnect_err}")
-            websocket_manager = None
             logger.info("WebSocket менеджер успешно остановлен")
 
     except Exception as err:
@@ -263,12 +353,14 @@ def create_application() -> FastAPI:
         version=settings.PROJECT_VERSION,
         debug=settings.DEBUG,
         lifespan=lifespan,
+        default_response_class=ORJSONResponse,
         docs_url=None if settings.ENVIRONMENT == "production" else "/docs",
         redoc_url=None if settings.ENVIRONMENT == "production" else "/redoc",
     )
 
-    _configure_cors(app)
     _configure_middleware(app)
+    # CORS регистрируется последним, чтобы оборачивать весь стек, включая ответы 429 ограничителя запросов
+    _configure_cors(app)
     register_exception_handlers(app)
     register_routers(app)
 
@@ -276,7 +368,9 @@ def create_application() -> FastAPI:
 
 def _configure_cors(app: FastAPI) -> None:
     """
-    Настройка CORS
+    Настройка CORS\n
+    Регистрируется после `_configure_middleware` и становится внешним middleware,
+    `Retry-After` открыт для чтения клиентом при ответе 429
     """
     if settings.CORS_ORIGINS:
         app.add_middleware(
@@ -285,17 +379,22 @@ def _configure_cors(app: FastAPI) -> None:
             allow_credentials=settings.CORS_ALLOW_CREDENTIALS,
             allow_methods=settings.CORS_ALLOW_METHODS,
             allow_headers=settings.CORS_ALLOW_HEADERS,
+            expose_headers=["Retry-After"],
         )
         logger.info(f"CORS включен для источников: {settings.CORS_ORIGINS}")
 
 def _configure_middleware(app: FastAPI) -> None:
     """
-    Настройка middleware
+    Настройка middleware\n
+    Middleware применяются в обратном порядке регистрации, итоговый порядок (снаружи внутрь):
+    CORS -> Prometheus -> RateLimit -> Security -> Timing\n
+    CORS добавляется отдельно в `_configure_cors` после этих middleware.
+    Ответ 429 формируется до Security, поэтому RateLimit сам добавляет к нему заголовки безопасности
     """
+    app.add_middleware(TimingMiddleware)
     app.add_middleware(SecurityMiddleware)
     app.add_middleware(RateLimitMiddleware)
     app.add_middleware(PrometheusMiddleware)
-    app.add_middleware(TimingMiddleware)
 
 
 # Регистрация обработчиков ошибок
@@ -305,21 +404,21 @@ def register_exception_handlers(app: FastAPI) -> None:
     """
     # Обработчик для валидации данных
     @app.exception_handler(RequestValidationError)
-    async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+    async def validation_exception_handler(request: Request, exc: RequestValidationError) -> ORJSONResponse:
         errors = [
-            {"message": error["msg"][13:] if error["msg"].startswith("Value error, ") else error["msg"]}
+            {"message": error["msg"].removeprefix(VALUE_ERROR_PREFIX)}
             for error in exc.errors()
         ]
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             content={"errors": errors}
         )
 
     # Обработчик для HTTPException
     @app.exception_handler(HTTPException)
-    async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
+    async def http_exception_handler(request: Request, exc: HTTPException) -> ORJSONResponse:
         logger.warning(f"HTTP-исключение: {exc.status_code} - {exc.detail}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={"message": exc.detail},
             headers=exc.headers,
@@ -327,9 +426,9 @@ def register_exception_handlers(app: FastAPI) -> None:
 
     # Обработчик для всех остальных исключений
     @app.exception_handler(Exception)
-    async def generic_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+    async def generic_exception_handler(request: Request, exc: Exception) -> ORJSONResponse:
         logger.error(f"Необработанное исключение: {str(exc)}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": "Внутренняя ошибка сервера"},
         )
@@ -354,6 +453,9 @@ if __name__ == "__main__":
         log_level=settings.LOG_LEVEL.lower(),
         workers=settings.WORKERS_COUNT,
         loop="uvloop",
+        http="httptools",
+        access_log=False, # Время запросов собирают TimingMiddleware и Prometheus
+        backlog=2048,
         limit_concurrency=settings.LIMIT_CONCURRENCY,
         timeout_keep_alive=settings.TIMEOUT_KEEP_ALIVE,
     )
@@ -3,7 +3,7 @@
 from abc import ABC
 from typing import Generic, TypeVar, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, insert, update, delete
 from sqlalchemy.orm import DeclarativeBase
 
 ModelType = TypeVar("ModelType", bound=DeclarativeBase)
@@ -43,25 +43,31 @@ class BaseRepository(ABC, Generic[ModelType]):
 
     async def create(self, obj_data: dict) -> ModelType:
         """
-        Создать новый объект\n
+        Создать новый объект одним запросом `INSERT ... RETURNING`\n
         `obj_data` - Данные объекта
         """
-        obj = self.model(**obj_data)
-        self.session.add(obj)
+        query = insert(self.model).values(**obj_data).returning(self.model)
+        result = await self.session.execute(query)
+        obj = result.scalar_one()
         await self.session.commit()
-        await self.session.refresh(obj)
         return obj
 
     async def update(self, id: str, obj_data: dict) -> Optional[ModelType]:
         """
-        Обновить объект\n
+        Обновить объект одним запросом `UPDATE ... RETURNING`\n
         `id` - ID объекта\n
         `obj_data` - Данные объекта
         """
-        query = update(self.model).where(self.model.id == id).values(**obj_data)
-        await self.session.execute(query)
+        query = (
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**obj_data)
+            .returning(self.model)
+        )
+        result = await self.session.execute(query)
+        obj = result.scalar_one_or_none()
         await self.session.commit()
-        return await self.get_by_id(id)
+        return obj
 
     async def delete(self, id: str) -> bool:
         """
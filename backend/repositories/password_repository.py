@@ -1,9 +1,9 @@
 # backend/repositories/password_repository.py - Репозиторий для работы с паролями
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func, case, lambda_stmt
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 
 from core.models.user import User
 from repositories.base_repository import BaseRepository
@@ -11,13 +11,14 @@ from core.extensions.logger import logger
 
 class PasswordRepository(BaseRepository[User]):
     """
-    Репозиторий для операций, связанных с паролями и безопасностью для работы с БД
+    Репозиторий для операций, связанных с паролями и безопасностью для работы с БД\n
+    Запросы выполняются на горячем пути входа, поэтому строятся через `lambda_stmt`:
+    SQLAlchemy компилирует их один раз и подставляет только параметры
 
     Методы:
         - `update_password_hash` - Обновляет хеш пароля пользователя
         - `get_password_hash` - Получает хеш пароля пользователя
-        - `increment_failed_attempts` - Увеличивает счетчик неудачных попыток входа
-        - `set_lockout_time` - Устанавливает время блокировки пользователя
+        - `register_failed_attempt` - Увеличивает счетчик неудачных попыток и при необходимости блокирует пользователя
         - `reset_failed_attempts` - Сбрасывает счетчик неудачных попыток и блокировку
         - `get_security_info` - Получает информацию о безопасности пользователя
     """
@@ -33,7 +34,9 @@ class PasswordRepository(BaseRepository[User]):
         Возвращает True, если пароль обновлен, иначе False
         """
         try:
-            stmt = update(User).where(User.id == user_id).values(hashed_password=new_password_hash)
+            stmt = lambda_stmt(
+                lambda: update(User).where(User.id == user_id).values(hashed_password=new_password_hash)
+            )
             result = await self.session.execute(stmt)
             await self.session.commit()
             
@@ -51,56 +54,44 @@ class PasswordRepository(BaseRepository[User]):
         Возвращает хеш пароля
         """
         try:
-            stmt = select(User.hashed_password).where(User.id == user_id)
-            result = await self.session.execute(stmt)
-            return result.scalar_one_or_none()
+            stmt = lambda_stmt(lambda: select(User.hashed_password).where(User.id == user_id))
+            return await self.session.scalar(stmt)
         except Exception as err:
             logger.error(f"[get_password_hash] Ошибка получения хеша пароля: {err}")
             raise
 
-    async def increment_failed_attempts(self, user_id: str) -> int:
+    async def register_failed_attempt(self, user_id: str, max_failed_attempts: int, lockout_end: datetime) -> Optional[Tuple[int, Optional[datetime]]]:
         """
-        Увеличивает счетчик неудачных попыток входа\n
+        Увеличивает счетчик неудачных попыток и, если достигнут порог, устанавливает блокировку одним запросом\n
         `user_id` - ID пользователя\n
-        Возвращает количество неудачных попыток
+        `max_failed_attempts` - Количество попыток, после которого пользователь блокируется\n
+        `lockout_end` - Время окончания блокировки\n
+        Возвращает (количество неудачных попыток, время блокировки) или None, если пользователь не найден
         """
         try:
-            # Получаем текущее значение
-            stmt = select(User.failed_login_attempts).where(User.id == user_id)
-            result = await self.session.execute(stmt)
-            current_attempts = result.scalar_one_or_none() or 0
-            
-            new_attempts = current_attempts + 1
-            
-            # Обновляем счетчик
-            update_stmt = update(User).where(User.id == user_id).values(
-                failed_login_attempts=new_attempts
+            stmt = lambda_stmt(
+                lambda: update(User)
+                .where(User.id == user_id)
+                .values(
+                    failed_login_attempts=func.coalesce(User.failed_login_attempts, 0) + 1,
+                    locked_until=case(
+                        (func.coalesce(User.failed_login_attempts, 0) + 1 >= max_failed_attempts, lockout_end),
+                        else_=User.locked_until
+                    )
+                )
+                .returning(User.failed_login_attempts, User.locked_until)
             )
-            await self.session.execute(update_stmt)
-            await self.session.commit()
-            return new_attempts
-        
-        except Exception as err:
-            await self.session.rollback()
-            logger.error(f"[increment_failed_attempts] Ошибка увеличения счетчика попыток: {err}")
-            raise
-
-    async def set_lockout_time(self, user_id: str, locked_until: datetime) -> bool:
-        """
-        Устанавливает время блокировки пользователя в БД\n
-        `user_id` - ID пользователя\n
-        `locked_until` - Время до которого заблокирован\n
-        Возвращает True если успешно
-        """
-        try:
-            stmt = update(User).where(User.id == user_id).values(locked_until=locked_until)
             result = await self.session.execute(stmt)
+            row = result.one_or_none()
             await self.session.commit()
-            return result.rowcount > 0
-            
+
+            if not row:
+                return None
+            return row.failed_login_attempts, row.locked_until
+
         except Exception as err:
             await self.session.rollback()
-            logger.error(f"[set_lockout_time] Ошибка установки времени блокировки: {err}")
+            logger.error(f"[register_failed_attempt] Ошибка регистрации неудачной попытки входа: {err}")
             raise
 
     async def reset_failed_attempts(self, user_id: str) -> bool:
@@ -110,9 +101,11 @@ class PasswordRepository(BaseRepository[User]):
         Возвращает True, если сброс выполнен, иначе False
         """
         try:
-            stmt = update(User).where(User.id == user_id).values(
-                failed_login_attempts=0,
-                locked_until=None
+            stmt = lambda_stmt(
+                lambda: update(User).where(User.id == user_id).values(
+                    failed_login_attempts=0,
+                    locked_until=None
+                )
             )
             result = await self.session.execute(stmt)
             await self.session.commit()
@@ -130,23 +123,17 @@ class PasswordRepository(BaseRepository[User]):
         Возвращает словарь с информацией о безопасности пользователя
         """
         try:
-            stmt = select(
-                User.failed_login_attempts,
-                User.locked_until,
-                User.hashed_password
-            ).where(User.id == user_id)
+            stmt = lambda_stmt(
+                lambda: select(
+                    User.failed_login_attempts.label('failed_attempts'),
+                    User.locked_until.label('locked_until'),
+                    User.hashed_password.label('password_hash')
+                ).where(User.id == user_id)
+            )
             
             result = await self.session.execute(stmt)
-            row = result.one_or_none()
-            
-            if not row:
-                return None
-            
-            return {
-                'failed_attempts': row.failed_login_attempts,
-                'locked_until': row.locked_until,
-                'password_hash': row.hashed_password
-            }
+            row = result.mappings().one_or_none()
+            return dict(row) if row else None
             
         except Exception as err:
             logger.error(f"Ошибка получения информации о безопасности: {err}")
@@ -1,38 +1,97 @@
 # backend/repositories/session_repository.py - Репозиторий для работы с сессиями в БД
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, and_
-from typing import List
+from sqlalchemy import select, update, and_, bindparam, func
+from typing import List, Dict, ClassVar
 from datetime import datetime
 
-from core.models.session import Session
+from core.models.session import Session, SessionView
 from repositories.base_repository import BaseRepository
 
+def utc_now():
+    """
+    Текущее время UTC, вычисляемое на стороне БД\n
+    Колонки времени сессий хранятся без часового пояса в UTC
+    """
+    return func.timezone("utc", func.now())
+
+# Колонки, из которых собирается SessionView
+SESSION_VIEW_COLUMNS = (
+    Session.id,
+    Session.user_id,
+    Session.device,
+    Session.browser,
+    Session.os,
+    Session.platform,
+    Session.location,
+    Session.ip_address,
+    Session.last_activity,
+    Session.created_at,
+    Session.is_active,
+)
+
+# Запрос пакетной записи активности сессий, собирается один раз при импорте
+FLUSH_LAST_ACTIVITY_STMT = update(Session.__table__).where(
+    Session.__table__.c.id == bindparam("session_id")
+).values(last_activity=bindparam("activity_time"))
+
 class SessionRepository(BaseRepository[Session]):
     """
     Репозиторий для работы с сессиями в БД
 
     Методы:
-        - `update_session_last_activity` - Обновляет время последней активности сессии
+        - `update_session_last_activity` - Откладывает обновление времени последней активности сессии
+        - `flush_session_last_activity` - Записывает отложенные обновления активности сессий одним запросом
         - `get_session_by_id` - Получает сессию по ID
         - `get_sessions_by_user` - Получает все сессии пользователя
         - `get_active_sessions_by_user` - Получает активные сессии пользователя
+        - `list_active_sessions_view` - Получает активные сессии пользователя только для чтения
         - `deactivate_session` - Деактивирует сессию
         - `terminate_other_sessions` - Завершает все сессии пользователя, кроме текущей
         - `deactivate_all_sessions` - Деактивирует все сессии пользователя
+        - `rotate_to_single_session` - Оставляет активной только текущую сессию пользователя и обновляет её активность
     """
     
+    # Отложенные обновления активности сессий (session_id -> время), общие для всех экземпляров процесса
+    _pending_activity: ClassVar[Dict[str, datetime]] = {}
+
     def __init__(self, session: AsyncSession):
         super().__init__(session, Session)
     
     async def update_session_last_activity(self, session_id: str) -> None:
         """
-        Обновляет время последней активности сессии\n
+        Откладывает обновление времени последней активности сессии\n
+        Значение записывается в БД фоновой задачей через `flush_session_last_activity`,
+        повторные обновления одной сессии между записями объединяются.
+        Не выполняет запросов и не фиксирует транзакцию текущего запроса\n
         `session_id` - ID сессии\n
         """
-        stmt = update(Session).where(Session.id == session_id).values(last_activity=datetime.utcnow())
-        await self.session.execute(stmt)
-        await self.session.commit()
+        SessionRepository._pending_activity[str(session_id)] = datetime.utcnow()
+
+    @classmethod
+    async def flush_session_last_activity(cls, session: AsyncSession) -> int:
+        """
+        Записывает отложенные обновления активности сессий одним пакетным UPDATE (executemany)\n
+        `session` - Сессия БД\n
+        Возвращает количество записанных сессий
+        """
+        if not cls._pending_activity:
+            return 0
+
+        pending, cls._pending_activity = cls._pending_activity, {}
+        try:
+            await session.execute(
+                FLUSH_LAST_ACTIVITY_STMT,
+                [{"session_id": session_id, "activity_time": last_activity} for session_id, last_activity in pending.items()]
+            )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            # Возвращаем неудачные обновления, не перезаписывая более свежие
+            for session_id, last_activity in pending.items():
+                cls._pending_activity.setdefault(session_id, last_activity)
+            raise
+        return len(pending)
 
     async def get_session_by_id(self, session_id: str) -> Session:
         """
@@ -70,13 +129,30 @@ class SessionRepository(BaseRepository[Session]):
         result = await self.session.execute(stmt)
         return list(result.scalars().all())
     
+    async def list_active_sessions_view(self, user_id: str) -> List[SessionView]:
+        """
+        Получает активные сессии пользователя только для чтения\n
+        Выбирает только колонки, без ORM объектов и их регистрации в сессии\n
+        `user_id` - ID пользователя\n
+        Возвращает список SessionView, отсортированных по времени последней активности
+        """
+        stmt = select(*SESSION_VIEW_COLUMNS).where(
+            and_(
+                Session.user_id == user_id,
+                Session.is_active == True
+            )
+        ).order_by(Session.last_activity.desc())
+
+        result = await self.session.execute(stmt)
+        return [SessionView(*row) for row in result.all()]
+
     async def deactivate_session(self, session_id: str) -> bool:
         """
         Деактивирует сессию\n
         `session_id` - ID сессии\n
         Возвращает True, если сессия была деактивирована, иначе False
         """
-        stmt = update(Session).where(Session.id == session_id).values(is_active=False, last_activity=datetime.utcnow())
+        stmt = update(Session).where(Session.id == session_id).values(is_active=False, last_activity=utc_now())
         result = await self.session.execute(stmt)
         await self.session.commit()
         return result.rowcount > 0
@@ -94,7 +170,7 @@ class SessionRepository(BaseRepository[Session]):
                 Session.id != current_session_id,
                 Session.is_active == True
             )
-        ).values(is_active=False, last_activity=datetime.utcnow())
+        ).values(is_active=False, last_activity=utc_now())
         
         result = await self.session.execute(stmt)
         await self.session.commit()
@@ -111,7 +187,29 @@ class SessionRepository(BaseRepository[Session]):
                 Session.user_id == user_id,
                 Session.is_active == True
             )
-        ).values(is_active=False, last_activity=datetime.utcnow())
+        ).values(is_active=False, last_activity=utc_now())
         result = await self.session.execute(stmt)
         await self.session.commit()
         return result.rowcount
+
+    async def rotate_to_single_session(self, user_id: str, current_session_id: str) -> int:
+        """
+        Оставляет активной только текущую сессию пользователя и обновляет её активность одним запросом\n
+        `user_id` - ID пользователя\n
+        `current_session_id` - ID текущей сессии\n
+        Возвращает количество завершенных сессий
+        """
+        stmt = update(Session).where(
+            and_(
+                Session.user_id == user_id,
+                Session.is_active == True
+            )
+        ).values(
+            is_active=Session.id == current_session_id,
+            last_activity=utc_now()
+        ).returning(Session.id, Session.is_active)
+
+        result = await self.session.execute(stmt)
+        rows = result.all()
+        await self.session.commit()
+        return sum(1 for row in rows if not row.is_active)
@@ -1,7 +1,7 @@
 # backend/repositories/user_repository.py - Репозиторий для работы с пользователями
 
 from typing import Optional
-from sqlalchemy import select, or_
+from sqlalchemy import select, insert, update, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from repositories.base_repository import BaseRepository
@@ -37,11 +37,15 @@ class UserRepository(BaseRepository[User]):
         `login_or_email` - login/email пользователя\n
         Возвращает пользователя или None
         """
-        query = select(User).where(
-            or_(User.login == login_or_email, User.email == login_or_email)
+        # UNION ALL двух поисков по уникальным индексам вместо OR, который не всегда использует индексы
+        query = select(User).from_statement(
+            union_all(
+                select(User).where(User.login == login_or_email),
+                select(User).where(User.email == login_or_email),
+            ).limit(1)
         )
         result = await self.session.execute(query)
-        return result.scalar_one_or_none()
+        return result.scalars().first()
 
     async def create_user(self, user_data: dict) -> User:
         """
@@ -49,17 +53,24 @@ class UserRepository(BaseRepository[User]):
         `user_data` - Данные пользователя для регистрации\n
         Возвращает нового пользователя  
         """
-        new_user = User(**user_data)
-        self.session.add(new_user)
+        query = insert(User).values(**user_data).returning(User)
+        result = await self.session.execute(query)
+        new_user = result.scalar_one()
         await self.session.commit()
         return new_user
     
-    async def update_user(self, user: User) -> User:
+    async def update_user(self, user: User, changes: Optional[dict] = None) -> User:
         """
         Обновляет данные пользователя\n
         `user` - Пользователь для обновления\n
+        `changes` - Измененные поля пользователя. Если переданы, записываются запросом `UPDATE ... RETURNING`,
+        иначе фиксируются изменения, уже внесенные в объект `user`\n
         Возвращает обновленного пользователя
         """
+        if changes:
+            query = update(User).where(User.id == user.id).values(**changes).returning(User)
+            result = await self.session.execute(query)
+            user = result.scalar_one()
+
         await self.session.commit()
-        await self.session.refresh(user)
         return user
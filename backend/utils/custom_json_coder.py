@@ -1,17 +1,38 @@
 # backend/utils/custom_json_coder.py - CustomJsonCoder
 
-import json
+from typing import Any
+import orjson
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
 from fastapi_cache.coder import JsonCoder
 
+def _default(value: Any) -> Any:
+    """
+    Сериализация типов, которые orjson не поддерживает нативно (Pydantic модели, Decimal и т.д.)\n
+    `value` - значение для сериализации
+    """
+    return jsonable_encoder(value)
+
 class CustomJsonCoder(JsonCoder):
     """
-    JsonCoder, который:
-      - При записи в Redis отдаёт plain JSON-строку (str), так что с decode_responses=True всё ровно сохраняется/читается как str
+    JsonCoder на orjson, который:
+      - При записи в Redis отдаёт JSON в bytes; datetime, UUID и dataclass кодируются orjson нативно
       - При загрузке принимает и bytes, и str и всегда возвращает Python-объект
-    """    
-    def dump(self, value: any) -> any:
-        return json.dumps(value, default=self.default)
+      - В отличие от JsonCoder не восстанавливает datetime, date и Decimal при загрузке: они возвращаются строками
+    """
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        # Готовый JSONResponse кэшируется как есть, как в JsonCoder
+        if isinstance(value, JSONResponse):
+            return value.body
+        return orjson.dumps(value, default=_default)
+
+    @classmethod
+    def decode(cls, value: Any) -> Any:
+        return orjson.loads(value)
+
+    def dump(self, value: Any) -> str:
+        return self.encode(value).decode("utf-8")
 
-    def load(self, value: any) -> any:
-        text = value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else value
-        return json.loads(text)
+    def load(self, value: Any) -> Any:
+        return self.decode(value)
@@ -1,28 +1,76 @@
 # utils/functions.py
 # Модуль с вспомогательными функциями для работы с данными
+#
+# Потокобезопасность: функции модуля можно вызывать одновременно из event loop и потоков threadpool FastAPI.
+# Кэши lru_cache (_format_date_cached, _format_phone_number_cached, validate_email) общие для всех потоков процесса:
+# реализация lru_cache в CPython написана на C и защищена GIL, отдельной блокировки и конкуренции за нее нет.
+# Кэшируемые функции чистые, поэтому гонка при одновременном промахе приводит лишь к повторному вычислению.
+# Очиститель bleach не потокобезопасен и хранится отдельно для каждого потока (_get_html_cleaner).
 
+from datetime import datetime
 from dateutil import parser as date_parser
 import phonenumbers
 from phonenumbers import PhoneNumberFormat
-from email_validator import validate_email, EmailNotValidError
-from typing import Optional
+from email_validator import validate_email as _validate_email, EmailNotValidError
+from functools import lru_cache
+from typing import Iterable, List, Optional
+from html.entities import html5 as _HTML5_ENTITIES
+import re
+import threading
+import warnings
 import bleach
 
+from core.config.config import settings
+
+# HTML теги (открывающие, закрывающие, комментарии, объявления) и управляющие символы, удаляемые при очистке ввода.
+# '<', за которым не начинается тег (например '1<2'), тегом не считается и экранируется как текст
+_TAG_RE = re.compile(r'<(?:/?[A-Za-z](?:[^>"\']|"[^"]*"|\'[^\']*\')*|/|!--.*?--|[!?][^>]*)>', re.S)
+# '&' с необязательной ссылкой на символ; известные ссылки сохраняются, остальные '&' экранируются
+_ENTITY_RE = re.compile(r'&(#[0-9]+;|#[xX][0-9A-Fa-f]+;|[A-Za-z][A-Za-z0-9]*;)?')
+_CTRL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# Очистители HTML через bleach без разрешенных тегов, по одному на поток (Cleaner не потокобезопасен)
+_HTML_CLEANERS = threading.local()
+# Экранирование кавычек и удаление NUL символов для SQL контекста за один проход
+_SQL_TRANS = str.maketrans({"'": "''", "\x00": None})
+# Российский мобильный номер в формате E.164 (+79XXXXXXXXX), форматируется без разбора phonenumbers
+_RU_MOBILE_E164_RE = re.compile(r'^\+79\d{9}$')
+# Пустые значения и даты-заглушки из старых систем, для которых format_date возвращает None без разбора
+_EMPTY_SENTINELS = frozenset({None, "", "0001-01-01T00:00:00", "1970-01-01T00:00:00Z"})
+
 # Форматирование даты из формата 'YYYY-MM-DDTHH:MM:SS+TZ' в 'DD.MM.YYYY'
 def format_date(date_str: str) -> Optional[str]:
     """
     Форматирование даты из формата 'YYYY-MM-DDTHH:MM:SS+TZ' в 'DD.MM.YYYY'
     :param date_str: Строка с датой в формате ISO
-    :return: Отформатированная дата или None в случае ошибки
+    :return: Отформатированная дата или None в случае ошибки.
+    Если SERVER_SIDE_DATE_FORMAT выключен, строка возвращается без изменений для форматирования на клиенте
     """
-    if not date_str:
+    if not settings.SERVER_SIDE_DATE_FORMAT:
+        return date_str
+    if not isinstance(date_str, str) or date_str in _EMPTY_SENTINELS:
         return None
-        
+
+    return _format_date_cached(date_str)
+
+@lru_cache(maxsize=8192)
+def _format_date_cached(
+    date_str: str,
+    _fromisoformat=datetime.fromisoformat,
+    _isoparse=date_parser.isoparse
+) -> Optional[str]:
+    """
+    Кэшируемая реализация `format_date` для непустых строк\n
+    Аргументы с префиксом `_` - заранее связанные глобальные имена, не передаются при вызове
+    """
     try:
-        dt = date_parser.isoparse(date_str)
-        return dt.strftime('%d.%m.%Y')
-    except (ValueError, TypeError, AttributeError):
-        return None
+        dt = _fromisoformat(date_str.replace('Z', '+00:00'))
+    except ValueError:
+        # Редкие варианты ISO 8601, которые не поддерживает fromisoformat
+        try:
+            dt = _isoparse(date_str)
+        except (ValueError, TypeError, AttributeError):
+            return None
+    return f"{dt.day:02d}.{dt.month:02d}.{dt.year:04d}"
 
 # Форматирование российского номера телефона в международный формат
 def format_phone_number(phone_number: str) -> Optional[str]:
@@ -31,6 +79,24 @@ def format_phone_number(phone_number: str) -> Optional[str]:
     :param `phone_number`: Номер телефона для форматирования
     :return: Отформатированный номер телефона или None в случае ошибки
     """
+    if not phone_number or not isinstance(phone_number, str):
+        return None
+
+    return _format_phone_number_cached(phone_number)
+
+@lru_cache(maxsize=8192)
+def _format_phone_number_cached(
+    phone_number: str,
+    _parse=phonenumbers.parse,
+    _valid=phonenumbers.is_valid_number,
+    _fmt=phonenumbers.format_number,
+    _intl=PhoneNumberFormat.INTERNATIONAL,
+    _exc=phonenumbers.NumberParseException
+) -> Optional[str]:
+    """
+    Кэшируемая реализация `format_phone_number` для непустых строк\n
+    Аргументы с префиксом `_` - заранее связанные глобальные имена, не передаются при вызове
+    """
     try:
         # Если номер начинается с 8, заменяем на +7
         if phone_number.startswith('8'):
@@ -40,15 +106,43 @@ def format_phone_number(phone_number: str) -> Optional[str]:
         if not phone_number.startswith('+'):
             phone_number = '+7' + phone_number
 
-        parsed = phonenumbers.parse(phone_number, "RU")
-        if phonenumbers.is_valid_number(parsed):
-            return phonenumbers.format_number(parsed, PhoneNumberFormat.INTERNATIONAL)
+        parsed = _parse(phone_number, "RU")
+        if _valid(parsed):
+            # Российские мобильные номера всегда имеют вид '+7 9XX XXX-XX-XX', правила phonenumbers не нужны
+            if parsed.country_code == 7 and 9_000_000_000 <= parsed.national_number < 10_000_000_000:
+                return _format_ru_national_number(str(parsed.national_number))
+            return _fmt(parsed, _intl)
         else:
             return phone_number
-    except phonenumbers.NumberParseException:
+    except _exc:
         return phone_number
 
+# Пакетное форматирование номеров телефонов в международный формат
+def format_phone_numbers(phone_numbers: Iterable[str]) -> List[Optional[str]]:
+    """
+    Пакетное форматирование номеров телефонов в международный формат
+    :param `phone_numbers`: Номера телефонов для форматирования
+    :return: Список отформатированных номеров в том же порядке (None для пустых значений)
+    """
+    # Загружаем метаданные RU один раз до цикла
+    phonenumbers.PhoneMetadata.metadata_for_region("RU")
+
+    result = []
+    for phone_number in phone_numbers:
+        if phone_number and isinstance(phone_number, str) and _RU_MOBILE_E164_RE.match(phone_number):
+            result.append(_format_ru_national_number(phone_number[2:]))
+        else:
+            result.append(format_phone_number(phone_number))
+    return result
+
+def _format_ru_national_number(digits: str) -> str:
+    """
+    Форматирование 10-значного российского номера в вид '+7 XXX XXX-XX-XX'
+    """
+    return f"+7 {digits[0:3]} {digits[3:6]}-{digits[6:8]}-{digits[8:10]}"
+
 # Валидация email адреса
+@lru_cache(maxsize=4096)
 def validate_email(email: str) -> bool:
     """
     Валидация email адреса
@@ -56,24 +150,58 @@ def validate_email(email: str) -> bool:
     :return: True если email валиден иначе False
     """
     try:
-        validate_email(email, check_deliverability=False)
+        _validate_email(email, check_deliverability=False)
         return True
     except EmailNotValidError:
         return False
 
+def _get_html_cleaner() -> bleach.Cleaner:
+    """
+    Возвращает очиститель HTML текущего потока, создавая его при первом обращении
+    """
+    cleaner = getattr(_HTML_CLEANERS, "cleaner", None)
+    if cleaner is None:
+        cleaner = _HTML_CLEANERS.cleaner = bleach.Cleaner(tags=[], attributes={}, strip=True)
+    return cleaner
+
+def _escape_ampersand(match: re.Match) -> str:
+    """
+    Экранирует '&', если за ним не следует известная ссылка на символ
+    """
+    entity = match.group(1)
+    if entity and (entity[0] == '#' or entity in _HTML5_ENTITIES):
+        return match.group(0)
+    return '&amp;' + (entity or '')
+
 # Очистка входных данных от потенциально опасных символов
-def sanitize_input(input_str: str, context: str = "html") -> str:
+def sanitize_input(input_str: str, context: str = "html", strict: bool = False) -> str:
     """
     Очистка входных данных от потенциально опасных символов
     :param input_str: Строка для очистки
     :param context: Контекст, в котором используется строка
+    :param strict: Очистка HTML через bleach вместо регулярных выражений
     :return: Очищенная строка
+    Без `strict` результат совпадает с bleach: теги удаляются, '<', '>' и одиночные '&' экранируются,
+    ссылки на символы (`&nbsp;`, `&#60;`) остаются как есть. Отличия от bleach: управляющие символы удаляются,
+    а не заменяются на '?', незакрытый тег в конце строки экранируется, а не удаляется
     """
     if not input_str:
         return ""
     if context == "html":
-        return bleach.clean(input_str, tags=[], attributes={}, strip=True)
+        # Быстрый путь: без HTML метасимволов и управляющих символов очищать нечего
+        if '<' not in input_str and '>' not in input_str and '&' not in input_str and not _CTRL_RE.search(input_str):
+            return input_str
+        if strict:
+            return _get_html_cleaner().clean(input_str)
+        # Удаляем все теги и экранируем оставшийся текст, как bleach с пустым списком тегов
+        stripped = _CTRL_RE.sub('', _TAG_RE.sub('', input_str))
+        return _ENTITY_RE.sub(_escape_ampersand, stripped).replace('<', '&lt;').replace('>', '&gt;')
     elif context == "sql":
-        return input_str.replace("'", "''")
+        warnings.warn(
+            "sanitize_input(context='sql') устарел, используйте параметризованные запросы",
+            DeprecationWarning,
+            stacklevel=2
+        )
+        return input_str.translate(_SQL_TRANS)
     else:
         return input_str
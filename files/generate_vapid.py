@@ -1,27 +1,67 @@
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import serialization
+from typing import List, Tuple
+import multiprocessing
 import base64
+import os
+import sys
 
-private_key = ec.generate_private_key(ec.SECP256R1())
-private_key_bytes = private_key.private_bytes(
-    encoding=serialization.Encoding.PEM,
-    format=serialization.PrivateFormat.PKCS8,
-    encryption_algorithm=serialization.NoEncryption()
-)
-public_key = private_key.public_key()
-public_key_bytes = public_key.public_bytes(
-    encoding=serialization.Encoding.X962,
-    format=serialization.PublicFormat.UncompressedPoint
-)
+# Параметры сериализации ключей, общие для всех генераций
+_CURVE = ec.SECP256R1()
+_PEM = serialization.Encoding.PEM
+_PKCS8 = serialization.PrivateFormat.PKCS8
+_NO_ENCRYPTION = serialization.NoEncryption()
+_X962 = serialization.Encoding.X962
+_UNCOMPRESSED_POINT = serialization.PublicFormat.UncompressedPoint
+
+# Длина заполнения '=' в base64 в зависимости от остатка длины данных по модулю 3
+_B64_PADDING = (0, 2, 1)
 
 def b64url(data: bytes) -> str:
-    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
-
-print("VAPID_PRIVATE_KEY (PEM):")
-print(private_key_bytes.decode())
-print()
-print("VAPID_PRIVATE_KEY (b64):")
-print(b64url(private_key_bytes))
-print()
-print("VAPID_PUBLIC_KEY (b64):")
-print(b64url(public_key_bytes))
+    encoded = base64.urlsafe_b64encode(data)
+    padding = _B64_PADDING[len(data) % 3]
+    return (encoded[:-padding] if padding else encoded).decode('ascii')
+
+def generate_vapid() -> Tuple[str, str, str]:
+    """
+    Генерирует пару ключей VAPID на кривой P-256\n
+    Возвращает (приватный ключ PEM, приватный ключ b64, публичный ключ b64).
+    Приватный ключ b64 - 32-байтовый скаляр d в base64url, как требует RFC 8292
+    """
+    private_key = ec.generate_private_key(_CURVE)
+    private_key_bytes = private_key.private_bytes(
+        encoding=_PEM,
+        format=_PKCS8,
+        encryption_algorithm=_NO_ENCRYPTION
+    )
+    public_key_bytes = private_key.public_key().public_bytes(
+        encoding=_X962,
+        format=_UNCOMPRESSED_POINT
+    )
+    private_value_bytes = private_key.private_numbers().private_value.to_bytes(32, 'big')
+    return private_key_bytes.decode(), b64url(private_value_bytes), b64url(public_key_bytes)
+
+def _gen_one(_: int) -> Tuple[str, str, str]:
+    """
+    Генерирует одну пару ключей в процессе пула, аргумент - номер пары из `map`
+    """
+    return generate_vapid()
+
+def generate_vapid_batch(n: int) -> List[Tuple[str, str, str]]:
+    """
+    Генерирует `n` пар ключей VAPID параллельно в пуле процессов\n
+    `n` - Количество пар ключей
+    """
+    if n <= 1:
+        return [generate_vapid() for _ in range(n)]
+    with multiprocessing.Pool(min(n, os.cpu_count() or 1)) as pool:
+        return pool.map(_gen_one, range(n))
+
+if __name__ == "__main__":
+    private_key_pem, private_key_b64, public_key_b64 = generate_vapid()
+
+    sys.stdout.write(
+        f"VAPID_PRIVATE_KEY (PEM):\n{private_key_pem}\n\n"
+        f"VAPID_PRIVATE_KEY (b64):\n{private_key_b64}\n\n"
+        f"VAPID_PUBLIC_KEY (b64):\n{public_key_b64}\n"
+    )